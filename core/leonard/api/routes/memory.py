@@ -73,11 +73,15 @@ async def toggle_memory(request: ToggleRequest):
 
 
 @router.post("/reindex", response_model=MemoryStatusResponse)
-async def reindex():
-    """Force rebuild the document index."""
+async def reindex(force: bool = False):
+    """
+    Update the document index for new, changed and removed files.
+
+    Pass force=true to delete the index and rebuild it from scratch.
+    """
     try:
         mm = await get_memory_manager()
-        await mm.reindex()
+        await mm.reindex(force=force)
         status = mm.get_status()
         return MemoryStatusResponse(**status)
     except Exception as e:
@@ -26,6 +26,7 @@ from leonard.engine.router import Router, RoutingDecision
 from leonard.models.downloader import ModelDownloader
 from leonard.models.registry import ModelRegistry
 from leonard.runtime.process_manager import ProcessManager
+from leonard.tools.base import ToolCategory
 from leonard.tools.executor import ToolExecutor
 from leonard.utils.logging import logger
 from leonard.utils.response_formatter import ResponseFormatter
@@ -131,6 +132,7 @@ NEVER claim you can delete, rename, move, or create files - you cannot."""
 
         self.tools_enabled = tools_enabled
         self.tool_executor = ToolExecutor(confirmation_callback=confirmation_callback) if tools_enabled else None
+        self._icon_by_category = {cat: self._tool_icon(cat.value) for cat in ToolCategory}
 
         self.rag_enabled = rag_enabled
         self._memory_manager = None
@@ -1580,7 +1582,7 @@ NEVER claim you can delete, rename, move, or create files - you cannot."""
                 "id": t.name,
                 "name": t.name,
                 "description": t.description,
-                "icon": self._tool_icon(t.category.value),
+                "icon": self._icon_by_category[t.category],
                 "enabled": t.enabled and self.tools_enabled,
             }
             for t in self.tool_executor.registry.list_all()
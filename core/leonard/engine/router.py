@@ -4,6 +4,7 @@ It analyzes the user's message and routes to the best available model.
 """
 
 import json
+import re
 from typing import Optional
 
 from pydantic import BaseModel
@@ -12,6 +13,9 @@ from leonard.models.registry import ModelCapability, ModelRegistry, RegisteredMo
 from leonard.runtime.process_manager import ProcessManager
 from leonard.utils.logging import logger
 
+# Markdown code fence around the router's JSON, with optional language tag
+_CODE_FENCE_RE = re.compile(r"```(?:json)?(.*?)(?:```|$)", re.DOTALL)
+
 
 class RoutingDecision(BaseModel):
     """Result of routing analysis."""
@@ -146,10 +150,9 @@ Respond ONLY with the JSON object, no other text."""
         try:
             # Clean response (remove markdown if present)
             response = response.strip()
-            if response.startswith("```"):
-                response = response.split("```")[1]
-                if response.startswith("json"):
-                    response = response[4:]
+            fence = _CODE_FENCE_RE.match(response)
+            if fence:
+                response = fence.group(1)
             response = response.strip()
 
             data = json.loads(response)
@@ -3,10 +3,61 @@ Memory Manager using LlamaIndex.
 Provides document indexing and RAG retrieval with a simple toggle interface.
 """
 
+import asyncio
+import functools
 import json
+import os
+import platform
+import tempfile
+from collections import OrderedDict
 from pathlib import Path
 from leonard.utils.logging import logger
 
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBED_BATCH_SIZE = 64
+# Int8-quantized ONNX exports shipped in the model's hub repo, by CPU architecture
+ONNX_MODEL_FILES = {
+    "arm64": "onnx/model_qint8_arm64.onnx",
+    "aarch64": "onnx/model_qint8_arm64.onnx",
+    "x86_64": "onnx/model_quint8_avx2.onnx",
+    "amd64": "onnx/model_quint8_avx2.onnx",
+}
+
+
+@functools.lru_cache(maxsize=1)
+def get_embed_model() -> tuple:
+    """
+    Load the embedding model once per process, preferring int8 ONNX Runtime.
+
+    Every MemoryManager shares this instance, so the model weights are only
+    loaded once. Falls back to PyTorch when the architecture has no quantized
+    export or the ONNX extras (sentence-transformers[onnx]) are not installed.
+
+    Returns the model and its backend ("onnx:<file_name>" or "torch"). The
+    backends produce slightly different vectors, so the index records which
+    one embedded it.
+    """
+    from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+    onnx_file = ONNX_MODEL_FILES.get(platform.machine().lower())
+    if onnx_file:
+        try:
+            model = HuggingFaceEmbedding(
+                model_name=EMBED_MODEL_NAME,
+                embed_batch_size=EMBED_BATCH_SIZE,
+                backend="onnx",
+                model_kwargs={"file_name": onnx_file},
+            )
+            return model, f"onnx:{onnx_file}"
+        except Exception as e:
+            logger.info(f"ONNX embedding backend unavailable, using PyTorch: {e}")
+
+    model = HuggingFaceEmbedding(
+        model_name=EMBED_MODEL_NAME,
+        embed_batch_size=EMBED_BATCH_SIZE,
+    )
+    return model, "torch"
+
 
 class MemoryManager:
     """
@@ -18,14 +69,27 @@ class MemoryManager:
     SETTINGS_FILE = Path.home() / ".leonard" / "memory_settings.json"
     INDEX_METADATA_FILE = INDEX_DIR / "index_metadata.json"
     AUTO_FOLDERS = ["Documents", "Desktop", "Downloads"]
+    QUERY_CACHE_SIZE = 512
+    CONTEXT_CHUNK_CHARS = 500
 
     def __init__(self):
         self.enabled = False
         self.indexed = False
         self.index = None
         self.embed_model = None
+        self.embed_backend: str | None = None
+        # Backend that embedded the saved index; queries must use the same one
+        self.index_backend: str | None = None
         self._indexing = False
+        # Serializes loading, rebuilding, updating and unloading the index
+        self._index_lock = asyncio.Lock()
         self.indexed_files: list[str] = []
+        # File path -> mtime at the last index update, used to find changed files
+        self.file_mtimes: dict[str, float] = {}
+        # Normalized query -> embedding, most recently used last
+        self._query_embeddings: OrderedDict[str, list[float]] = OrderedDict()
+        # (normalized query, max_chars) -> formatted context; cleared when the index changes
+        self._contexts: OrderedDict[tuple[str, int], str] = OrderedDict()
 
     async def initialize(self):
         """Initialize the memory manager."""
@@ -53,107 +117,124 @@ class MemoryManager:
                 with open(self.INDEX_METADATA_FILE, "r") as f:
                     data = json.load(f)
                     self.indexed_files = data.get("indexed_files", [])
+                    self.file_mtimes = data.get("file_mtimes", {})
+                    self.index_backend = data.get("embed_backend")
             except Exception as e:
                 logger.warning(f"Failed to load index metadata: {e}")
                 self.indexed_files = []
+                self.file_mtimes = {}
+                self.index_backend = None
 
     def _save_index_metadata(self) -> None:
         """Persist indexed file metadata to disk."""
         try:
-            self.INDEX_DIR.mkdir(parents=True, exist_ok=True)
-            with open(self.INDEX_METADATA_FILE, "w") as f:
-                json.dump({"indexed_files": self.indexed_files}, f)
+            self._write_json(
+                self.INDEX_METADATA_FILE,
+                {
+                    "indexed_files": self.indexed_files,
+                    "file_mtimes": self.file_mtimes,
+                    "embed_backend": self.index_backend,
+                },
+            )
         except Exception as e:
             logger.warning(f"Failed to save index metadata: {e}")
 
     def _save_settings(self):
         """Save settings to disk."""
         try:
-            self.SETTINGS_FILE.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.SETTINGS_FILE, "w") as f:
-                json.dump({"enabled": self.enabled}, f)
+            self._write_json(self.SETTINGS_FILE, {"enabled": self.enabled})
         except Exception as e:
             logger.error(f"Failed to save memory settings: {e}")
 
+    def _write_json(self, path: Path, data: dict) -> None:
+        """Write JSON via a temp file and rename, so a crash never leaves a torn file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=path.parent) as tmp:
+            json.dump(data, tmp)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            temp_name = tmp.name
+
+        os.replace(temp_name, path)
+
     async def toggle(self, enabled: bool) -> bool:
         """Toggle memory on/off."""
         self.enabled = enabled
-        self._save_settings()
+        await asyncio.to_thread(self._save_settings)
 
-        if enabled and not self.index:
+        if enabled:
             await self._load_or_build_index()
-        elif not enabled:
-            self.index = None
-            self.indexed = False
+        else:
+            # Waits for a running reindex instead of pulling the index out from under it
+            async with self._index_lock:
+                if not self.enabled:
+                    self.index = None
+                    self.indexed = False
+                    self._contexts.clear()
 
         return self.enabled
 
     async def _load_or_build_index(self):
         """Load existing index or build a new one."""
-        if self._indexing:
-            return
-
-        self._indexing = True
-        try:
-            # Lazy import LlamaIndex to avoid startup overhead
-            from llama_index.core import StorageContext, load_index_from_storage
-            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-
-            # Initialize embedding model
-            if not self.embed_model:
-                logger.info("Loading embedding model...")
-                self.embed_model = HuggingFaceEmbedding(model_name="all-MiniLM-L6-v2")
-
-            if self.INDEX_DIR.exists() and (self.INDEX_DIR / "docstore.json").exists():
-                # Load existing index
-                logger.info("Loading existing index...")
-                storage_context = StorageContext.from_defaults(persist_dir=str(self.INDEX_DIR))
-                self.index = load_index_from_storage(
-                    storage_context, embed_model=self.embed_model
-                )
-                self.indexed = True
-            else:
-                # Build new index
-                await self._rebuild_index()
+        async with self._index_lock:
+            if self.index or not self.enabled:
+                return
 
-            if self.indexed and not self.indexed_files:
-                self._load_index_metadata()
-            logger.info("Index loaded successfully")
+            self._indexing = True
+            try:
+                # Lazy import LlamaIndex to avoid startup overhead
+                from llama_index.core import StorageContext, load_index_from_storage
+
+                # Initialize embedding model
+                if not self.embed_model:
+                    logger.info("Loading embedding model...")
+                    self.embed_model, self.embed_backend = get_embed_model()
+
+                saved = self.INDEX_DIR.exists() and (self.INDEX_DIR / "docstore.json").exists()
+                if saved:
+                    self._load_index_metadata()
+                    if self.index_backend != self.embed_backend:
+                        # Vectors from another backend don't match this model's queries
+                        logger.info(
+                            f"Index was embedded with {self.index_backend or 'unknown backend'}"
+                            f", rebuilding with {self.embed_backend}"
+                        )
+                        self._clear_index()
+                        saved = False
+
+                if saved:
+                    # Load existing index
+                    logger.info("Loading existing index...")
+                    storage_context = StorageContext.from_defaults(
+                        persist_dir=str(self.INDEX_DIR)
+                    )
+                    self.index = load_index_from_storage(
+                        storage_context, embed_model=self.embed_model
+                    )
+                    self.indexed = True
+                    self._contexts.clear()
+                else:
+                    # Build new index
+                    await self._rebuild_index()
+
+                if self.indexed and not self.indexed_files:
+                    self._load_index_metadata()
+                logger.info("Index loaded successfully")
 
-        except Exception as e:
-            logger.error(f"Failed to load/build index: {e}")
-            self.index = None
-            self.indexed = False
-        finally:
-            self._indexing = False
+            except Exception as e:
+                logger.error(f"Failed to load/build index: {e}")
+                self.index = None
+                self.indexed = False
+            finally:
+                self._indexing = False
 
     async def _rebuild_index(self):
         """Rebuild the index from auto-folders."""
         try:
-            from llama_index.core import VectorStoreIndex, SimpleDirectoryReader
+            from llama_index.core import StorageContext, VectorStoreIndex
 
             logger.info("Building new index from user folders...")
-
-            # Collect documents from all auto-folders
-            all_documents = []
-            home = Path.home()
-
-            for folder_name in self.AUTO_FOLDERS:
-                folder_path = home / folder_name
-                if folder_path.exists() and folder_path.is_dir():
-                    logger.info(f"Indexing {folder_path}...")
-                    try:
-                        reader = SimpleDirectoryReader(
-                            input_dir=str(folder_path),
-                            recursive=True,
-                            exclude_hidden=True,
-                            errors="ignore",
-                        )
-                        docs = reader.load_data()
-                        all_documents.extend(docs)
-                        logger.info(f"Loaded {len(docs)} documents from {folder_name}")
-                    except Exception as e:
-                        logger.warning(f"Error reading {folder_name}: {e}")
+            all_documents, file_mtimes = await self._load_documents()
 
             if not all_documents:
                 logger.warning("No documents found to index")
@@ -162,16 +243,24 @@ class MemoryManager:
 
             # Build the index
             logger.info(f"Building index from {len(all_documents)} documents...")
-            self.index = VectorStoreIndex.from_documents(
-                all_documents, embed_model=self.embed_model
+            storage_context = StorageContext.from_defaults()
+            for doc in all_documents:
+                storage_context.docstore.set_document_hash(doc.id_, doc.hash)
+            self.index = VectorStoreIndex(
+                self._documents_to_nodes(all_documents),
+                storage_context=storage_context,
+                embed_model=self.embed_model,
             )
 
             # Persist to disk
             self.INDEX_DIR.mkdir(parents=True, exist_ok=True)
             self.index.storage_context.persist(persist_dir=str(self.INDEX_DIR))
             self.indexed = True
+            self._contexts.clear()
             self.indexed_files = self._extract_indexed_files(all_documents)
-            self._save_index_metadata()
+            self.file_mtimes = file_mtimes
+            self.index_backend = self.embed_backend
+            await asyncio.to_thread(self._save_index_metadata)
             logger.info("Index built and persisted successfully")
 
         except Exception as e:
@@ -179,9 +268,169 @@ class MemoryManager:
             self.index = None
             self.indexed = False
 
-    async def reindex(self):
-        """Force rebuild the index."""
-        # Clear existing index
+    async def _refresh_index(self):
+        """Update the index in place for files added, changed or removed since the last build."""
+        current = await self._scan_files()
+        changed = [path for path, mtime in current.items() if self.file_mtimes.get(path) != mtime]
+        removed = (self.file_mtimes.keys() | set(self.indexed_files)) - current.keys()
+        if not changed and not removed:
+            logger.info("Index is up to date")
+            return
+
+        logger.info(f"Updating index: {len(changed)} new or changed, {len(removed)} removed files")
+        documents = await asyncio.to_thread(self._load_files, changed) if changed else []
+
+        # A file can map to several ref docs (e.g. one per PDF page)
+        ref_doc_ids: dict[str, list[str]] = {}
+        for ref_doc_id, info in self.index.ref_doc_info.items():
+            ref_doc_ids.setdefault(info.metadata.get("file_path"), []).append(ref_doc_id)
+        for path in removed.union(changed):
+            for ref_doc_id in ref_doc_ids.get(path, []):
+                self.index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+
+        if documents:
+            for doc in documents:
+                self.index.docstore.set_document_hash(doc.id_, doc.hash)
+            self.index.insert_nodes(self._documents_to_nodes(documents))
+
+        self.index.storage_context.persist(persist_dir=str(self.INDEX_DIR))
+        # Clear only now: queries made while files were loading still saw the old index
+        self._contexts.clear()
+        stale = removed.union(changed)
+        self.indexed_files = sorted(
+            {path for path in self.indexed_files if path not in stale}
+            | set(self._extract_indexed_files(documents))
+        )
+        self.file_mtimes = current
+        await asyncio.to_thread(self._save_index_metadata)
+        logger.info("Index updated and persisted successfully")
+
+    async def _load_documents(self) -> tuple[list, dict[str, float]]:
+        """Read all auto-folders concurrently; return their documents and file mtimes."""
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._load_folder, name) for name in self.AUTO_FOLDERS)
+        )
+        documents: list = []
+        file_mtimes: dict[str, float] = {}
+        for docs, mtimes in results:
+            documents.extend(docs)
+            file_mtimes.update(mtimes)
+        return documents, file_mtimes
+
+    async def _scan_files(self) -> dict[str, float]:
+        """Collect file mtimes for all auto-folders without reading the files."""
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._scan_folder, name) for name in self.AUTO_FOLDERS)
+        )
+        file_mtimes: dict[str, float] = {}
+        for mtimes in results:
+            file_mtimes.update(mtimes)
+        return file_mtimes
+
+    def _load_folder(self, folder_name: str) -> tuple[list, dict[str, float]]:
+        """Read one auto-folder under the home directory (blocking)."""
+        reader = self._folder_reader(folder_name)
+        if reader is None:
+            return [], {}
+
+        logger.info(f"Indexing {reader.input_dir}...")
+        try:
+            mtimes = self._get_file_mtimes(reader.input_files)
+            docs = reader.load_data()
+            logger.info(f"Loaded {len(docs)} documents from {folder_name}")
+            return docs, mtimes
+        except Exception as e:
+            logger.warning(f"Error reading {folder_name}: {e}")
+            return [], {}
+
+    def _scan_folder(self, folder_name: str) -> dict[str, float]:
+        """List one auto-folder's files with their mtimes (blocking)."""
+        reader = self._folder_reader(folder_name)
+        if reader is None:
+            return {}
+        return self._get_file_mtimes(reader.input_files)
+
+    def _folder_reader(self, folder_name: str):
+        """Create a reader over an auto-folder, or None if it is missing or unreadable."""
+        from llama_index.core import SimpleDirectoryReader
+
+        folder_path = Path.home() / folder_name
+        if not folder_path.is_dir():
+            return None
+
+        try:
+            return SimpleDirectoryReader(
+                input_dir=str(folder_path),
+                recursive=True,
+                exclude_hidden=True,
+                errors="ignore",
+            )
+        except Exception as e:
+            logger.warning(f"Error reading {folder_name}: {e}")
+            return None
+
+    def _load_files(self, paths: list[str]) -> list:
+        """Read specific files (blocking)."""
+        from llama_index.core import SimpleDirectoryReader
+
+        return SimpleDirectoryReader(input_files=paths, errors="ignore").load_data()
+
+    def _get_file_mtimes(self, paths: list) -> dict[str, float]:
+        """Stat files, skipping any that disappeared since they were listed."""
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[str(path)] = os.stat(path).st_mtime
+            except OSError:
+                continue
+        return mtimes
+
+    def _documents_to_nodes(self, documents: list) -> list:
+        """
+        Split documents into nodes ordered by text length.
+
+        Embedding batches are padded to their longest text, so keeping
+        similar lengths together avoids embedding padding tokens.
+        """
+        from llama_index.core import Settings
+        from llama_index.core.ingestion import run_transformations
+
+        nodes = run_transformations(documents, Settings.transformations)
+        return sorted(nodes, key=lambda node: len(node.get_content()))
+
+    async def reindex(self, force: bool = False):
+        """
+        Bring the index up to date with the auto-folders.
+
+        A loaded index is updated in place, re-embedding only new or changed
+        files. Otherwise, if the update fails, if the index was embedded with
+        a different backend, or with force=True, the index is deleted and
+        rebuilt from scratch.
+        """
+        async with self._index_lock:
+            self._indexing = True
+            try:
+                index = self.index
+                current = self.index_backend == self.embed_backend
+                if self.enabled and index and current and not force:
+                    try:
+                        await self._refresh_index()
+                        return
+                    except Exception as e:
+                        if not self.enabled or self.index is not index:
+                            # Turned off or unloaded mid-update: keep the saved index
+                            logger.warning(f"Memory disabled during index update: {e}")
+                            return
+                        logger.error(f"Failed to update index, rebuilding: {e}")
+
+                self._clear_index()
+                if self.enabled:
+                    await self._rebuild_index()
+            finally:
+                self._indexing = False
+
+    def _clear_index(self) -> None:
+        """Delete the saved index and forget what it contained."""
         if self.INDEX_DIR.exists():
             import shutil
             shutil.rmtree(self.INDEX_DIR)
@@ -189,9 +438,9 @@ class MemoryManager:
         self.index = None
         self.indexed = False
         self.indexed_files = []
-
-        if self.enabled:
-            await self._rebuild_index()
+        self.file_mtimes = {}
+        self.index_backend = None
+        self._contexts.clear()
 
     async def get_context_for_query(self, query: str, max_chars: int = 2000) -> str:
         """
@@ -205,35 +454,79 @@ class MemoryManager:
         if not self.enabled or not self.index:
             return ""
 
-        try:
-            retriever = self.index.as_retriever(similarity_top_k=3)
-            nodes = retriever.retrieve(query)
-
-            if not nodes:
-                return ""
+        # Repeated questions skip embedding and retrieval entirely
+        key = (self._normalize_query(query), max_chars)
+        context = self._contexts.get(key)
+        if context is not None:
+            self._contexts.move_to_end(key)
+            return context
 
-            # Format context with source citations, respecting max_chars
-            context_parts = []
-            total_chars = 0
+        try:
+            from llama_index.core.schema import QueryBundle
 
-            for node in nodes:
-                source = node.metadata.get("file_name", "unknown")
-                text = node.text.strip()[:500]  # Limit each chunk
-                if text:
-                    part = f"[{source}]: {text}"
-                    if total_chars + len(part) > max_chars:
-                        break
-                    context_parts.append(part)
-                    total_chars += len(part)
+            # Pass a precomputed embedding so the retriever doesn't re-embed the query
+            query_bundle = QueryBundle(
+                query_str=query, embedding=self._get_query_embedding(query)
+            )
+            retriever = self.index.as_retriever(similarity_top_k=3)
+            nodes = retriever.retrieve(query_bundle)
 
+            context_parts = self._format_context_parts(nodes, max_chars) if nodes else []
             context = "\n\n".join(context_parts)
-            logger.info(f"Retrieved {len(context_parts)} relevant chunks ({total_chars} chars)")
+            if context_parts:
+                logger.info(
+                    f"Retrieved {len(context_parts)} relevant chunks ({len(context)} chars)"
+                )
+            self._contexts[key] = context
+            if len(self._contexts) > self.QUERY_CACHE_SIZE:
+                self._contexts.popitem(last=False)
             return context
 
         except Exception as e:
             logger.error(f"Failed to retrieve context: {e}")
             return ""
 
+    def _format_context_parts(self, nodes: list, max_chars: int) -> list[str]:
+        """Format retrieved nodes with source citations, respecting max_chars once joined."""
+        separator_len = len("\n\n")
+        context_parts = []
+        total_chars = 0
+
+        for node in nodes:
+            # Only the trailing strip runs after slicing, on at most CONTEXT_CHUNK_CHARS
+            text = node.text.lstrip()[: self.CONTEXT_CHUNK_CHARS].rstrip()
+            if not text:
+                continue
+            source = node.metadata.get("file_name", "unknown")
+            part_len = len(source) + len("[]: ") + len(text)
+            if context_parts:
+                part_len += separator_len
+            if total_chars + part_len > max_chars:
+                break
+            context_parts.append(f"[{source}]: {text}")
+            total_chars += part_len
+
+        return context_parts
+
+    def _get_query_embedding(self, query: str) -> list[float]:
+        """Embed a query, reusing the embedding of recently seen identical queries."""
+        key = self._normalize_query(query)
+        embedding = self._query_embeddings.get(key)
+        if embedding is not None:
+            self._query_embeddings.move_to_end(key)
+            return embedding
+
+        embedding = self.embed_model.get_query_embedding(query)
+        self._query_embeddings[key] = embedding
+        if len(self._query_embeddings) > self.QUERY_CACHE_SIZE:
+            self._query_embeddings.popitem(last=False)
+        return embedding
+
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Cache key for a query: case- and whitespace-insensitive."""
+        return " ".join(query.lower().split())
+
     def get_status(self) -> dict:
         """Get current memory status."""
         return {
@@ -258,4 +551,6 @@ class MemoryManager:
         """Clean shutdown."""
         self.index = None
         self.embed_model = None
+        self._query_embeddings.clear()
+        self._contexts.clear()
         logger.info("Memory manager shut down")
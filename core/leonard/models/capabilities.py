@@ -126,6 +126,18 @@ class CapabilityDetector:
         ModelCapability.GENERAL: 0.7,
     }
 
+    def __init__(self):
+        # (normalized pattern, pattern), longest first so the most specific match wins
+        self._repo_patterns: list[tuple[str, str]] = [
+            (pattern.replace("-", " "), pattern)
+            for pattern in sorted(self.PATTERNS, key=len, reverse=True)
+        ]
+        # Description keywords are less reliable, so their scores are weighted down
+        self._description_keywords: list[tuple[str, dict[ModelCapability, float]]] = [
+            (keyword, {k: v * 0.8 for k, v in caps.items()})
+            for keyword, caps in self.DESCRIPTION_KEYWORDS.items()
+        ]
+
     def detect(
         self,
         repo_id: str,
@@ -179,11 +191,7 @@ class CapabilityDetector:
         name = repo_id.lower().replace("/", " ").replace("-", " ").replace("_", " ")
 
         # Check each pattern (longer patterns first for specificity)
-        sorted_patterns = sorted(self.PATTERNS.keys(), key=len, reverse=True)
-
-        for pattern in sorted_patterns:
-            # Normalize pattern the same way (replace hyphens with spaces)
-            pattern_normalized = pattern.replace("-", " ")
+        for pattern_normalized, pattern in self._repo_patterns:
             # Check if pattern words appear in sequence in the name
             if pattern_normalized in name:
                 self._merge_capabilities(capabilities, self.PATTERNS[pattern])
@@ -209,10 +217,8 @@ class CapabilityDetector:
 
         desc_lower = description.lower()
 
-        for keyword, caps in self.DESCRIPTION_KEYWORDS.items():
+        for keyword, weighted_caps in self._description_keywords:
             if keyword in desc_lower:
-                # Lower weight for description keywords (less reliable)
-                weighted_caps = {k: v * 0.8 for k, v in caps.items()}
                 self._merge_capabilities(capabilities, weighted_caps)
 
         return capabilities
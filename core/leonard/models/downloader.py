@@ -78,6 +78,15 @@ class ModelDownloader:
         "internvl",   # InternVL
     ]
 
+    # HuggingFace tags of architectures llama.cpp can't run
+    INCOMPATIBLE_TAGS = frozenset({
+        "mamba",
+        "rwkv",
+        "vision",
+        "image-to-text",
+        "image-text-to-text",
+    })
+
     def __init__(self, models_dir: Path | None = None):
         self.models_dir = models_dir or Path.home() / ".leonard" / "models"
         self.models_dir.mkdir(parents=True, exist_ok=True)
@@ -102,12 +111,8 @@ class ModelDownloader:
                 return False
 
         # Check tags if provided
-        if tags:
-            tags_lower = [t.lower() for t in tags]
-            incompatible_tags = ["mamba", "rwkv", "vision", "image-to-text", "image-text-to-text"]
-            for tag in incompatible_tags:
-                if tag in tags_lower:
-                    return False
+        if tags and any(t.lower() in self.INCOMPATIBLE_TAGS for t in tags):
+            return False
 
         return True
 
@@ -0,0 +1,37 @@
+from leonard.models.capabilities import CapabilityDetector
+from leonard.models.registry import ModelCapability
+
+
+def test_repo_name_uses_most_specific_pattern():
+    detector = CapabilityDetector()
+
+    caps = detector._detect_from_repo_name("Qwen/Qwen2.5-Coder-7B-Instruct-GGUF")
+
+    assert caps == CapabilityDetector.PATTERNS["qwen2.5-coder"]
+
+
+def test_repo_name_prefers_longer_pattern_over_earlier_one():
+    detector = CapabilityDetector()
+
+    caps = detector._detect_from_repo_name("someone/code-mistral-7b")
+
+    assert caps == CapabilityDetector.PATTERNS["mistral"]
+
+
+def test_repo_name_without_pattern_falls_back_to_defaults():
+    detector = CapabilityDetector()
+
+    assert detector._detect_from_repo_name("someone/unknown-model") == {}
+    assert detector.detect("someone/unknown-model") == {ModelCapability.GENERAL: 0.7}
+
+
+def test_description_keywords_are_weighted_down():
+    detector = CapabilityDetector()
+
+    caps = detector._detect_from_description("A Mathematical reasoning assistant")
+
+    assert caps == {
+        ModelCapability.MATH: 0.75 * 0.8,
+        ModelCapability.REASONING: 0.7 * 0.8,
+        ModelCapability.GENERAL: 0.7 * 0.8,
+    }
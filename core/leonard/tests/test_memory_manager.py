@@ -0,0 +1,284 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from leonard.memory import MemoryManager
+
+
+class _CountingEmbedModel:
+    def __init__(self):
+        self.calls: list[str] = []
+
+    def get_query_embedding(self, query: str) -> list[float]:
+        self.calls.append(query)
+        return [float(len(query))]
+
+
+def test_query_embedding_is_cached_for_repeated_queries():
+    manager = MemoryManager()
+    manager.embed_model = _CountingEmbedModel()
+
+    first = manager._get_query_embedding("Where is my  resume?")
+    second = manager._get_query_embedding("where is my resume?")
+
+    assert first == second
+    assert manager.embed_model.calls == ["Where is my  resume?"]
+
+
+def test_query_embedding_cache_evicts_least_recently_used():
+    manager = MemoryManager()
+    manager.embed_model = _CountingEmbedModel()
+    manager.QUERY_CACHE_SIZE = 2
+
+    manager._get_query_embedding("alpha")
+    manager._get_query_embedding("beta")
+    manager._get_query_embedding("alpha")
+    manager._get_query_embedding("gamma")
+    manager._get_query_embedding("alpha")
+    manager._get_query_embedding("beta")
+
+    assert manager.embed_model.calls == ["alpha", "beta", "gamma", "beta"]
+
+
+def test_settings_and_index_metadata_round_trip(tmp_path, monkeypatch):
+    index_dir = tmp_path / "index"
+    monkeypatch.setattr(MemoryManager, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(MemoryManager, "SETTINGS_FILE", tmp_path / "memory_settings.json")
+    monkeypatch.setattr(MemoryManager, "INDEX_METADATA_FILE", index_dir / "index_metadata.json")
+
+    manager = MemoryManager()
+    manager.enabled = True
+    manager.indexed_files = ["/tmp/a.txt"]
+    manager.file_mtimes = {"/tmp/a.txt": 1.5}
+    manager._save_settings()
+    manager._save_index_metadata()
+
+    loaded = MemoryManager()
+    loaded._load_settings()
+
+    assert loaded.enabled is True
+    assert loaded.indexed_files == ["/tmp/a.txt"]
+    assert loaded.file_mtimes == {"/tmp/a.txt": 1.5}
+    assert sorted(p.name for p in index_dir.iterdir()) == ["index_metadata.json"]
+
+
+class _Node:
+    def __init__(self, text: str, file_name: str):
+        self.text = text
+        self.metadata = {"file_name": file_name}
+
+
+def test_context_parts_truncate_chunks_and_respect_budget():
+    manager = MemoryManager()
+    nodes = [
+        _Node("  " + "a" * 2000, "long.txt"),
+        _Node("   ", "blank.txt"),
+        _Node("short note\n", "note.md"),
+        _Node("b" * 400, "over.txt"),
+    ]
+
+    parts = manager._format_context_parts(nodes, max_chars=520)
+
+    assert parts == ["[long.txt]: " + "a" * 500]
+
+    parts = manager._format_context_parts(nodes, max_chars=2000)
+
+    assert parts == [
+        "[long.txt]: " + "a" * 500,
+        "[note.md]: short note",
+        "[over.txt]: " + "b" * 400,
+    ]
+
+
+def test_context_parts_keep_text_after_long_leading_whitespace():
+    manager = MemoryManager()
+    nodes = [_Node(" " * 1500 + "c" * 600, "indented.txt")]
+
+    assert manager._format_context_parts(nodes, max_chars=2000) == ["[indented.txt]: " + "c" * 500]
+
+
+def test_context_parts_count_separators_in_budget():
+    manager = MemoryManager()
+    nodes = [_Node("a" * 10, "a.txt"), _Node("b" * 10, "b.txt")]
+    joined = "[a.txt]: " + "a" * 10 + "\n\n[b.txt]: " + "b" * 10
+
+    assert len(manager._format_context_parts(nodes, max_chars=len(joined))) == 2
+    parts = manager._format_context_parts(nodes, max_chars=len(joined) - 1)
+    assert parts == ["[a.txt]: " + "a" * 10]
+
+
+class _CountingIndex:
+    def __init__(self, nodes: list):
+        self.nodes = nodes
+        self.retrievals = 0
+
+    def as_retriever(self, similarity_top_k: int):
+        return self
+
+    def retrieve(self, query_bundle):
+        self.retrievals += 1
+        return self.nodes
+
+
+@pytest.mark.asyncio
+async def test_context_is_cached_until_index_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(MemoryManager, "SETTINGS_FILE", tmp_path / "memory_settings.json")
+    manager = MemoryManager()
+    manager.enabled = True
+    manager.embed_model = _CountingEmbedModel()
+    manager.index = _CountingIndex([_Node("short note", "note.md")])
+
+    first = await manager.get_context_for_query("What's in my notes?")
+    second = await manager.get_context_for_query("what's in my  notes?")
+
+    assert first == second == "[note.md]: short note"
+    assert manager.index.retrievals == 1
+
+    await manager.get_context_for_query("What's in my notes?", max_chars=10)
+    assert manager.index.retrievals == 2
+
+    await manager.toggle(False)
+    manager.enabled = True
+    manager.index = _CountingIndex([_Node("new note", "note.md")])
+
+    context = await manager.get_context_for_query("What's in my notes?")
+    assert context == "[note.md]: new note"
+
+
+@pytest.mark.asyncio
+async def test_reindex_drops_context_cached_while_updating(tmp_path, monkeypatch):
+    from llama_index.core.embeddings import MockEmbedding
+
+    index_dir = tmp_path / "index"
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(MemoryManager, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(MemoryManager, "SETTINGS_FILE", tmp_path / "memory_settings.json")
+    monkeypatch.setattr(MemoryManager, "INDEX_METADATA_FILE", index_dir / "index_metadata.json")
+    monkeypatch.setattr(MemoryManager, "AUTO_FOLDERS", ["Documents"])
+    note = tmp_path / "Documents" / "a.txt"
+    note.parent.mkdir()
+    note.write_text("old secret text")
+
+    manager = MemoryManager()
+    manager.enabled = True
+    manager.embed_model = MockEmbedding(embed_dim=8)
+    await manager._rebuild_index()
+    assert await manager.get_context_for_query("secret") == "[a.txt]: old secret text"
+
+    load_files = manager._load_files
+
+    def slow_load_files(paths):
+        time.sleep(0.2)
+        return load_files(paths)
+
+    async def query_during_update():
+        await asyncio.sleep(0.05)
+        return await manager.get_context_for_query("secret")
+
+    manager._load_files = slow_load_files
+    note.write_text("new text")
+    os.utime(note, (1, 1))
+    _, during = await asyncio.gather(manager.reindex(), query_during_update())
+
+    assert during == "[a.txt]: old secret text"
+    assert await manager.get_context_for_query("secret") == "[a.txt]: new text"
+
+    index = manager.index
+    await manager.reindex(force=True)
+    assert manager.index is not index
+    assert await manager.get_context_for_query("secret") == "[a.txt]: new text"
+
+    note.unlink()
+    await manager.reindex()
+
+    assert await manager.get_context_for_query("secret") == ""
+
+
+@pytest.mark.asyncio
+async def test_disabling_memory_during_reindex_keeps_saved_index(tmp_path, monkeypatch):
+    from llama_index.core.embeddings import MockEmbedding
+
+    index_dir = tmp_path / "index"
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(MemoryManager, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(MemoryManager, "SETTINGS_FILE", tmp_path / "memory_settings.json")
+    monkeypatch.setattr(MemoryManager, "INDEX_METADATA_FILE", index_dir / "index_metadata.json")
+    monkeypatch.setattr(MemoryManager, "AUTO_FOLDERS", ["Documents"])
+    note = tmp_path / "Documents" / "a.txt"
+    note.parent.mkdir()
+    note.write_text("old text")
+
+    manager = MemoryManager()
+    manager.enabled = True
+    manager.embed_model = MockEmbedding(embed_dim=8)
+    await manager._rebuild_index()
+
+    load_files = manager._load_files
+
+    def slow_load_files(paths):
+        time.sleep(0.2)
+        return load_files(paths)
+
+    async def toggle_off_during_update():
+        await asyncio.sleep(0.05)
+        assert manager.get_status()["indexing"] is True
+        await manager.toggle(False)
+
+    manager._load_files = slow_load_files
+    note.write_text("new text")
+    os.utime(note, (1, 1))
+    await asyncio.gather(manager.reindex(), toggle_off_during_update())
+
+    assert manager.index is None
+    assert manager.get_status()["indexing"] is False
+    assert (index_dir / "docstore.json").exists()
+    assert manager.file_mtimes == {str(note): 1}
+
+
+@pytest.mark.asyncio
+async def test_index_from_another_embedding_backend_is_rebuilt(tmp_path, monkeypatch):
+    from llama_index.core.embeddings import MockEmbedding
+
+    from leonard.memory import manager as manager_module
+
+    index_dir = tmp_path / "index"
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(MemoryManager, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(MemoryManager, "SETTINGS_FILE", tmp_path / "memory_settings.json")
+    monkeypatch.setattr(MemoryManager, "INDEX_METADATA_FILE", index_dir / "index_metadata.json")
+    monkeypatch.setattr(MemoryManager, "AUTO_FOLDERS", ["Documents"])
+    (tmp_path / "Documents").mkdir()
+    (tmp_path / "Documents" / "a.txt").write_text("some text")
+
+    rebuild_index = MemoryManager._rebuild_index
+    rebuilds = []
+
+    async def counting_rebuild(self):
+        rebuilds.append(self.embed_backend)
+        await rebuild_index(self)
+
+    monkeypatch.setattr(MemoryManager, "_rebuild_index", counting_rebuild)
+
+    async def load(backend: str) -> MemoryManager:
+        monkeypatch.setattr(
+            manager_module, "get_embed_model", lambda: (MockEmbedding(embed_dim=8), backend)
+        )
+        manager = MemoryManager()
+        manager.enabled = True
+        await manager._load_or_build_index()
+        assert manager.index is not None
+        return manager
+
+    await load("torch")
+    await load("torch")
+    assert rebuilds == ["torch"]
+
+    rebuilt = await load("onnx:onnx/model_quint8_avx2.onnx")
+
+    assert rebuilds == ["torch", "onnx:onnx/model_quint8_avx2.onnx"]
+    assert rebuilt.index_backend == "onnx:onnx/model_quint8_avx2.onnx"
+    saved = json.loads((index_dir / "index_metadata.json").read_text())
+    assert saved["embed_backend"] == "onnx:onnx/model_quint8_avx2.onnx"
@@ -123,18 +123,20 @@ class FileOperations:
                 return _verification_failure(f"Not a directory: {dir_path}", "list", [str(dir_path)])
 
             items = []
-            for item in sorted(dir_path.iterdir()):
-                if not show_hidden and item.name.startswith("."):
-                    continue
-                item_type = "dir" if item.is_dir() else "file"
-                size = item.stat().st_size if item.is_file() else 0
-                items.append(
-                    {
-                        "name": item.name,
-                        "type": item_type,
-                        "size_bytes": size,
-                    }
-                )
+            # scandir reuses the entry type from the directory read, so only files cost a stat()
+            with os.scandir(dir_path) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if not show_hidden and entry.name.startswith("."):
+                        continue
+                    item_type = "dir" if entry.is_dir() else "file"
+                    size = entry.stat().st_size if entry.is_file() else 0
+                    items.append(
+                        {
+                            "name": entry.name,
+                            "type": item_type,
+                            "size_bytes": size,
+                        }
+                    )
 
             return ToolResult(
                 status="success",